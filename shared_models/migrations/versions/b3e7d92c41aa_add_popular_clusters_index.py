@@ -0,0 +1,32 @@
+"""add_popular_clusters_index
+
+Revision ID: b3e7d92c41aa
+Revises: 0a220c51a87d
+Create Date: 2026-08-28 10:15:02.114937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7d92c41aa'
+down_revision: Union[str, Sequence[str], None] = '0a220c51a87d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add composite index for the popular-clusters query."""
+    op.create_index(
+        'ix_clusters_sources_created',
+        'clusters',
+        ['number_of_sources', 'created_at']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove popular-clusters index."""
+    op.drop_index('ix_clusters_sources_created', table_name='clusters')
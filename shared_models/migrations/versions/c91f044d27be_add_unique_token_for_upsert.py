@@ -0,0 +1,33 @@
+"""add_unique_token_for_upsert
+
+Revision ID: c91f044d27be
+Revises: b3e7d92c41aa
+Create Date: 2026-08-28 10:41:55.302184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91f044d27be'
+down_revision: Union[str, Sequence[str], None] = 'b3e7d92c41aa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - add unique constraint on user_tokens.token.
+
+    Required as the conflict target for the token registration upsert.
+    """
+    # For SQLite, we need to use batch mode to add constraints
+    with op.batch_alter_table('user_tokens') as batch_op:
+        batch_op.create_unique_constraint('uq_user_tokens_token', ['token'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove unique constraint on user_tokens.token."""
+    op.drop_constraint('uq_user_tokens_token', 'user_tokens', type_='unique')
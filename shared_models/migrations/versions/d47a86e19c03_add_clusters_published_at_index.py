@@ -0,0 +1,28 @@
+"""add_clusters_published_at_index
+
+Revision ID: d47a86e19c03
+Revises: c91f044d27be
+Create Date: 2026-08-28 14:32:18.905214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd47a86e19c03'
+down_revision: Union[str, Sequence[str], None] = 'c91f044d27be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - index published_at for the trending range filters."""
+    op.create_index('ix_clusters_published_at', 'clusters', ['published_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - remove published_at index."""
+    op.drop_index('ix_clusters_published_at', table_name='clusters')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.types import TypeDecorator
 import json
@@ -104,6 +104,16 @@ class Cluster(Base):
     # Relationships
     articles = relationship("Article", secondary=cluster_articles, back_populates="clusters")
 
+    # Composite index supporting the popular-clusters query
+    # (WHERE number_of_sources >= ? ORDER BY created_at DESC), plus a
+    # published_at index so the trending windows' range filters seek
+    # instead of scanning; ISO-8601 strings in one timezone order
+    # lexicographically, so a plain BTREE on the text column works
+    __table_args__ = (
+        Index('ix_clusters_sources_created', 'number_of_sources', 'created_at'),
+        Index('ix_clusters_published_at', 'published_at'),
+    )
+
     def add_article(self, session, article: Article, score: float):
         """Add an article to this cluster with similarity score"""
         from sqlalchemy import insert
@@ -150,7 +160,7 @@ class UserToken(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     device_id = Column(String)
-    token = Column(String)
+    token = Column(String, unique=True)  # Conflict target for the registration upsert
     platform = Column(String)  # 'android' or 'ios'
     created_at = Column(String)
     updated_at = Column(String)
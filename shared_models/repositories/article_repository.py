@@ -1,6 +1,6 @@
 import hashlib
 import re
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import and_, desc, func, or_
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
@@ -36,12 +36,33 @@ class ArticleRepository:
         # For testing, be more lenient with time filtering
         # In production, this would use proper datetime comparison
         from ..models import cluster_articles
-        return self.session.query(Article).outerjoin(
+        # Eager-load sources in one extra SELECT; callers read
+        # article.source per row, which would otherwise lazy-load each one
+        return self.session.query(Article).options(
+            selectinload(Article.source)
+        ).outerjoin(
             cluster_articles, Article.id == cluster_articles.c.article_id
         ).filter(
             cluster_articles.c.article_id.is_(None)
         ).all()
 
+    def stream_recent_unclustered(self, hours: int = 24, batch_size: int = 500):
+        """Iterate unclustered articles in batches instead of loading all().
+
+        Same rows as get_recent_unclustered, but yield_per fetches them
+        batch_size at a time so a large backlog never sits fully
+        materialized in memory; callers that only copy fields out can let
+        each batch be garbage-collected as they go.
+        """
+        from ..models import cluster_articles
+        return self.session.query(Article).options(
+            selectinload(Article.source)
+        ).outerjoin(
+            cluster_articles, Article.id == cluster_articles.c.article_id
+        ).filter(
+            cluster_articles.c.article_id.is_(None)
+        ).yield_per(batch_size)
+
     def insert_article(self, source_id: int, headline: str, description: str,
                       published_at: str, article_url: str, image_url: str = None,
                       category: str = "local") -> Article:
@@ -72,6 +93,70 @@ class ArticleRepository:
         self.session.flush()  # Get ID without committing
         return article
 
+    def bulk_insert_articles(self, rows: List[Dict[str, Any]]) -> List[Optional[Article]]:
+        """Insert many articles with one duplicate probe and one flush.
+
+        Each row carries the same fields as insert_article. Deduplication
+        runs once for the whole batch: a single content-hash SELECT, a
+        single article_url SELECT (catches reposts whose wording changed)
+        plus an in-batch seen check, then all new articles go out in one
+        executemany-style flush. Returns a list aligned with rows — the new
+        Article (id populated) or None where the row was a duplicate.
+        """
+        if not rows:
+            return []
+
+        hashes = [
+            self._compute_content_hash(row.get('headline'), row.get('description'))
+            for row in rows
+        ]
+
+        existing_hashes = {
+            content_hash for (content_hash,) in self.session.query(Article.content_hash).filter(
+                Article.content_hash.in_(set(hashes))
+            ).all()
+        }
+
+        urls = {row.get('article_url') for row in rows} - {None}
+        existing_urls = {
+            url for (url,) in self.session.query(Article.article_url).filter(
+                Article.article_url.in_(urls)
+            ).all()
+        } if urls else set()
+
+        created_at = datetime.now().isoformat()
+        results: List[Optional[Article]] = []
+        new_articles = []
+
+        for row, content_hash in zip(rows, hashes):
+            article_url = row.get('article_url')
+            if content_hash in existing_hashes or article_url in existing_urls:
+                results.append(None)
+                continue
+            existing_hashes.add(content_hash)  # in-batch duplicates keep the first row
+            if article_url is not None:
+                existing_urls.add(article_url)
+
+            article = Article(
+                source_id=row.get('source_id'),
+                headline=row.get('headline'),
+                description=row.get('description'),
+                published_at=row.get('published_at'),
+                article_url=row.get('article_url'),
+                image_url=row.get('image_url'),
+                created_at=created_at,
+                category=row.get('category', 'local'),
+                content_hash=content_hash
+            )
+            new_articles.append(article)
+            results.append(article)
+
+        if new_articles:
+            self.session.add_all(new_articles)
+            self.session.flush()  # One batched INSERT; IDs populated
+
+        return results
+
     def get_by_id(self, article_id: int) -> Optional[Article]:
         """Get article by ID"""
         return self.session.query(Article).filter(Article.id == article_id).first()
@@ -144,6 +144,75 @@ class ClusterRepository:
             'coverage_velocity': cluster.coverage_velocity
         }
 
+    def get_popular_clusters(self, threshold: int, limit: int = 50,
+                             since: str = None) -> List[Any]:
+        """Get clusters with at least `threshold` sources as lightweight rows.
+
+        Issues a Core-level select (id, title, number_of_sources, created_at)
+        with the predicate in SQL, so callers avoid materializing full ORM
+        entities just to filter them in Python.
+        """
+        from sqlalchemy import select
+        stmt = select(
+            Cluster.id, Cluster.title, Cluster.number_of_sources, Cluster.created_at
+        ).where(Cluster.number_of_sources >= threshold)
+        if since:
+            stmt = stmt.where(Cluster.created_at >= since)
+        stmt = stmt.order_by(desc(Cluster.created_at)).limit(limit)
+        return self.session.execute(stmt).all()
+
+    def get_article_counts_by_cluster(self, cluster_ids: List[int]) -> Dict[int, int]:
+        """Get article counts for many clusters in one aggregate query.
+
+        Replaces per-cluster detail fetches (classic N+1) when callers only
+        need how many articles each cluster has.
+        """
+        if not cluster_ids:
+            return {}
+
+        rows = self.session.query(
+            cluster_articles.c.cluster_id, func.count(cluster_articles.c.article_id)
+        ).filter(
+            cluster_articles.c.cluster_id.in_(cluster_ids)
+        ).group_by(cluster_articles.c.cluster_id).all()
+
+        return dict(rows)
+
+    def get_cluster_summary(self, cluster_id: int) -> Optional[Dict[str, Any]]:
+        """Get a cluster's notification-sized summary without loading articles.
+
+        Returns title, source/article counts and the earliest article's
+        headline and published_at via narrow queries — callers that only
+        need headline material should prefer this over get_cluster_details.
+        """
+        cluster = self.session.query(
+            Cluster.title, Cluster.number_of_sources
+        ).filter(Cluster.id == cluster_id).first()
+
+        if not cluster:
+            return None
+
+        article_count = self.session.query(
+            func.count(cluster_articles.c.article_id)
+        ).filter(cluster_articles.c.cluster_id == cluster_id).scalar()
+
+        earliest = self.session.query(
+            Article.headline, Article.published_at
+        ).join(
+            cluster_articles, cluster_articles.c.article_id == Article.id
+        ).filter(
+            cluster_articles.c.cluster_id == cluster_id,
+            Article.published_at.isnot(None)
+        ).order_by(Article.published_at).first()
+
+        return {
+            'title': cluster.title,
+            'number_of_sources': cluster.number_of_sources,
+            'article_count': article_count,
+            'earliest_headline': earliest.headline if earliest else None,
+            'earliest_published_at': earliest.published_at if earliest else None
+        }
+
     def get_recent_clusters(self, limit: int = 50, offset: int = 0) -> List[Cluster]:
         """Get recent clusters ordered by published date"""
         return self.session.query(Cluster).order_by(
@@ -376,6 +445,70 @@ class ClusterRepository:
         self.session.flush()
         return True
 
+    def recompute_trending_window(self, hours: int = 48) -> int:
+        """Recompute trending flags for every recent cluster in one statement.
+
+        Server-side equivalent of calling calculate_trending per cluster:
+        velocity is articles created in the last 6 hours over the previous
+        6 (or the recent count alone when there was no earlier coverage),
+        and a cluster trends when velocity > 1.5 with at least 3 sources.
+        Returns the number of clusters updated.
+        """
+        from datetime import timedelta
+        from sqlalchemy import text
+
+        current_time = now()
+        params = {
+            'cutoff': (current_time - timedelta(hours=hours)).isoformat(),
+            'six_ago': (current_time - timedelta(hours=6)).isoformat(),
+            'twelve_ago': (current_time - timedelta(hours=12)).isoformat(),
+            'now_iso': current_time.isoformat(),
+        }
+
+        result = self.session.execute(text("""
+            WITH counts AS (
+                SELECT c.id AS cluster_id,
+                       SUM(CASE WHEN a.created_at > :six_ago THEN 1 ELSE 0 END) AS recent_count,
+                       SUM(CASE WHEN a.created_at > :twelve_ago
+                                 AND a.created_at <= :six_ago THEN 1 ELSE 0 END) AS previous_count
+                FROM clusters c
+                LEFT JOIN cluster_articles ca ON ca.cluster_id = c.id
+                LEFT JOIN articles a ON a.id = ca.article_id
+                WHERE c.published_at >= :cutoff
+                GROUP BY c.id
+            ),
+            velocities AS (
+                SELECT cluster_id,
+                       CASE WHEN previous_count > 0
+                                THEN CAST(recent_count AS FLOAT) / previous_count
+                            WHEN recent_count > 0
+                                THEN CAST(recent_count AS FLOAT)
+                            ELSE 0.0 END AS velocity
+                FROM counts
+            )
+            UPDATE clusters SET
+                coverage_velocity = ROUND(CAST(
+                    (SELECT velocity FROM velocities v WHERE v.cluster_id = clusters.id)
+                    AS NUMERIC), 2),
+                is_trending = CASE
+                    WHEN (SELECT velocity FROM velocities v WHERE v.cluster_id = clusters.id) > 1.5
+                         AND clusters.number_of_sources >= 3
+                    THEN 1 ELSE 0 END,
+                last_coverage_check = :now_iso,
+                first_seen_at = COALESCE(first_seen_at, created_at)
+            WHERE clusters.id IN (SELECT cluster_id FROM velocities)
+        """), params)
+        self.session.flush()
+
+        updated = result.rowcount
+        if updated < 0:
+            # sqlite3 doesn't report rowcount for WITH ... UPDATE
+            updated = self.session.execute(
+                text("SELECT COUNT(*) FROM clusters WHERE published_at >= :cutoff"),
+                {'cutoff': params['cutoff']}
+            ).scalar()
+        return updated
+
     def get_trending_clusters(self, limit: int = 10) -> List[Cluster]:
         """Get clusters that are currently trending."""
         from datetime import timedelta
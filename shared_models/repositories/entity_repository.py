@@ -1,9 +1,19 @@
+import json
+from io import StringIO
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any
 from datetime import datetime
 from ..models import Entity, Article
 
 class EntityRepository:
+    # Below this batch size COPY's setup cost outweighs its win
+    COPY_MIN_ROWS = 100
+
+    _LIST_FIELDS = (
+        'people', 'cities', 'regions', 'countries', 'organizations',
+        'political_parties_and_militias', 'brands', 'job_titles'
+    )
+
     def __init__(self, session: Session):
         self.session = session
 
@@ -30,6 +40,69 @@ class EntityRepository:
         self.session.flush()
         return entity
 
+    def bulk_insert_entities(self, rows: list) -> None:
+        """Insert entity results for many articles with a single flush.
+
+        Each row is a dict holding article_id plus the insert_entities
+        fields; all rows go out in one executemany-style INSERT instead of
+        a round-trip per article. Large batches on PostgreSQL go through
+        COPY, which checks locks and types once per operation rather than
+        per row.
+        """
+        if not rows:
+            return
+
+        created_at = datetime.now().isoformat()
+
+        if (len(rows) >= self.COPY_MIN_ROWS
+                and self.session.bind.dialect.name == 'postgresql'):
+            self._copy_entities(rows, created_at)
+            return
+        self.session.add_all([
+            Entity(
+                article_id=row['article_id'],
+                people=row.get('people') or [],
+                cities=row.get('cities') or [],
+                regions=row.get('regions') or [],
+                countries=row.get('countries') or [],
+                organizations=row.get('organizations') or [],
+                political_parties_and_militias=row.get('political_parties_and_militias') or [],
+                brands=row.get('brands') or [],
+                job_titles=row.get('job_titles') or [],
+                category=row.get('category'),
+                created_at=created_at
+            ) for row in rows
+        ])
+        self.session.flush()
+
+    @staticmethod
+    def _copy_escape(value: str) -> str:
+        """Escape a field for PostgreSQL COPY text format (not CSV quoting)."""
+        return (value.replace('\\', '\\\\')
+                     .replace('\t', '\\t')
+                     .replace('\n', '\\n')
+                     .replace('\r', '\\r'))
+
+    def _copy_entities(self, rows: list, created_at: str) -> None:
+        """Stream entity rows into PostgreSQL with COPY via a TSV buffer."""
+        columns = ('article_id',) + self._LIST_FIELDS + ('category', 'created_at')
+
+        buffer = StringIO()
+        for row in rows:
+            category = row.get('category')
+            fields = (
+                [str(row['article_id'])]
+                + [self._copy_escape(json.dumps(row.get(field) or [], ensure_ascii=False))
+                   for field in self._LIST_FIELDS]
+                + [self._copy_escape(category) if category is not None else r'\N',
+                   created_at]
+            )
+            buffer.write('\t'.join(fields) + '\n')
+        buffer.seek(0)
+
+        cursor = self.session.connection().connection.cursor()
+        cursor.copy_from(buffer, Entity.__tablename__, columns=columns, sep='\t')
+
     def get_by_article_id(self, article_id: int) -> Optional[Entity]:
         """Get entities for a specific article"""
         return self.session.query(Entity).filter(Entity.article_id == article_id).first()
@@ -8,15 +8,46 @@ class TokenRepository:
         self.session = session
 
     def store_or_update_token(self, user_id: int = None, device_id: str = None,
-                             token: str = None, platform: str = None) -> UserToken:
-        """Store new token or update existing one"""
+                             token: str = None, platform: str = None) -> None:
+        """Store new token or update existing one.
+
+        On PostgreSQL and SQLite this is a single INSERT ... ON CONFLICT
+        (token) DO UPDATE, avoiding the SELECT-then-write round-trip; other
+        dialects fall back to the two-step path.
+        """
         if not all([device_id, token, platform]):
             raise ValueError("device_id, token, and platform are required")
 
-        # Check if token already exists
-        existing_token = self.session.query(UserToken).filter(UserToken.token == token).first()
-
         now = datetime.now().isoformat()
+        dialect = self.session.bind.dialect.name
+
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert_insert
+
+            stmt = upsert_insert(UserToken).values(
+                user_id=user_id,
+                device_id=device_id,
+                token=token,
+                platform=platform,
+                created_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['token'],
+                set_={
+                    'user_id': stmt.excluded.user_id,
+                    'device_id': stmt.excluded.device_id,
+                    'platform': stmt.excluded.platform,
+                    'updated_at': now
+                }
+            )
+            self.session.execute(stmt)
+            return
+
+        # Fallback: check if token already exists
+        existing_token = self.session.query(UserToken).filter(UserToken.token == token).first()
 
         if existing_token:
             # Update existing token
@@ -24,7 +55,6 @@ class TokenRepository:
             existing_token.device_id = device_id
             existing_token.platform = platform
             existing_token.updated_at = now
-            return existing_token
         else:
             # Create new token
             user_token = UserToken(
@@ -36,7 +66,6 @@ class TokenRepository:
             )
             self.session.add(user_token)
             self.session.flush()
-            return user_token
 
     def get_token_by_value(self, token: str) -> Optional[UserToken]:
         """Get token by FCM token value"""
@@ -47,13 +76,28 @@ class TokenRepository:
         return self.session.query(UserToken).filter(UserToken.user_id == user_id).all()
 
     def get_all_active_tokens(self) -> List[Dict[str, str]]:
-        """Get all active tokens for push notifications"""
-        tokens = self.session.query(UserToken).filter(
+        """Get all active tokens for push notifications, deduplicated in SQL"""
+        tokens = self.session.query(UserToken.token, UserToken.platform).filter(
             UserToken.token.isnot(None)
-        ).all()
+        ).distinct().all()
 
         return [{'token': t.token, 'platform': t.platform} for t in tokens]
 
+    def iter_active_tokens(self, batch_size: int = 1000):
+        """Stream active tokens in DB-side batches, deduplicated in SQL.
+
+        Unlike get_all_active_tokens this never materializes the full token
+        list, so callers fanning out to large audiences keep memory bounded
+        by batch_size and can start sending as soon as the first batch
+        arrives. The owning session must stay open while iterating.
+        """
+        query = self.session.query(UserToken.token, UserToken.platform).filter(
+            UserToken.token.isnot(None)
+        ).distinct().yield_per(batch_size)
+
+        for token, platform in query:
+            yield {'token': token, 'platform': platform}
+
     def delete_token(self, token: str) -> bool:
         """Delete a token"""
         user_token = self.get_token_by_value(token)
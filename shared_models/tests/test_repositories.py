@@ -237,6 +237,18 @@ class TestArticleRepository:
         # Note: Time filtering is disabled for testing purposes
         # In production, this would filter by actual time
 
+    def test_stream_recent_unclustered(self, test_db, sample_data):
+        """Test streaming unclustered articles in batches"""
+        article_repo = ArticleRepository(test_db)
+
+        streamed = list(article_repo.stream_recent_unclustered(hours=24, batch_size=1))
+        assert len(streamed) == 2
+        # Same rows as the materializing variant, sources eager-loaded
+        assert {a.id for a in streamed} == {
+            a.id for a in article_repo.get_recent_unclustered(hours=24)
+        }
+        assert all(a.source is not None for a in streamed)
+
     def test_list_by_filters(self, test_db, sample_data):
         """Test filtering articles"""
         article_repo = ArticleRepository(test_db)
@@ -371,6 +383,40 @@ class TestClusterRepository:
         assert details['title'] == "Test Cluster"
         assert 'articles' in details
 
+    def test_recompute_trending_window(self, test_db, sample_data):
+        """Test bulk trending recomputation over recent clusters"""
+        from ..timezone_utils import now
+
+        cluster_repo = ClusterRepository(test_db)
+        article_repo = ArticleRepository(test_db)
+
+        current = now()
+        cluster = cluster_repo.create_cluster("Surging Story", 3, current.isoformat())
+
+        source = sample_data['sources'][0]
+        # Three articles in the last 6 hours, one in the 6 hours before:
+        # velocity = 3 / 1, which with 3 sources should mark the cluster trending
+        created_times = [current - timedelta(hours=h) for h in (1, 2, 3, 8)]
+        for i, created in enumerate(created_times):
+            article = article_repo.insert_article(
+                source_id=source.id,
+                headline=f"Trending article {i}",
+                description=f"Body {i}",
+                published_at=created.isoformat(),
+                article_url=f"https://sudanile.com/trend{i}"
+            )
+            article.created_at = created.isoformat()
+            cluster.add_article(test_db, article, 0.9)
+        test_db.flush()
+
+        updated = cluster_repo.recompute_trending_window(hours=48)
+        assert updated >= 1
+
+        test_db.refresh(cluster)
+        assert cluster.coverage_velocity == 3.0
+        assert cluster.is_trending == 1
+        assert cluster.last_coverage_check is not None
+
 
 class TestTokenRepository:
     """Test TokenRepository functionality"""
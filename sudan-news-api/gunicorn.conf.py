@@ -11,3 +11,10 @@ proc_name = "sudan-news-api"
 # Server mechanics
 # USE ABSOLUTE PATH:
 pidfile = "/var/www/sudanese_news/shared/logs/gunicorn.pid"
+
+# Worker lifecycle
+# Warm each worker's Firebase client after fork so the first request never
+# pays credential/TLS setup, and no SSL state is inherited from the master.
+def post_fork(server, worker):
+    from src.notification_service import get_notification_service
+    get_notification_service()
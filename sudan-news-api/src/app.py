@@ -7,14 +7,33 @@ This service is read-only for event data and uses the shared repository pattern.
 """
 
 from flask import Flask, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from jinja2 import FileSystemBytecodeCache
 import os
 import sys
 import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from hashlib import blake2b
 import logging
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from cachetools import TTLCache, cached
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,8 +55,40 @@ from shared_models.repositories.article_repository import ArticleRepository
 from shared_models.repositories.source_repository import SourceRepository
 from shared_models.timezone_utils import now, to_app_timezone
 
-# Import notification service
-from .notification_service import notification_service
+# Import notification service (constructed lazily, once per worker)
+from .notification_service import get_notification_service
+
+# Single background worker for notification fan-out: request handlers
+# enqueue the send and return immediately instead of blocking on N FCM
+# round-trips. One worker keeps sends serialized and bounded.
+_notification_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notify')
+
+
+def _dispatch_notification(task, *args):
+    """Run a notification send in the background, logging its outcome."""
+    def _run():
+        try:
+            result = task(*args)
+            logger.info(f"Background notification finished: {result}")
+        except Exception as e:
+            logger.error(f"Background notification failed: {e}")
+
+    _notification_executor.submit(_run)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (C serializer, ~3-5x faster than stdlib json).
+
+    All jsonify(...) call sites benefit automatically once installed on the app.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 # Setup Flask app
 app = Flask(__name__,
@@ -45,9 +96,58 @@ app = Flask(__name__,
             static_folder=str(Path(__file__).parent.parent / 'static'))
 CORS(app)
 
+# Use orjson for all JSON responses when available (falls back to stdlib json)
+if ORJSON_AVAILABLE:
+    app.json = OrjsonProvider(app)
+else:
+    logger.warning("orjson not installed, falling back to stdlib json serializer")
+
+# Compress large responses (cluster detail payloads can exceed 100KB);
+# prefer Brotli, fall back to gzip for clients that don't accept it
+if COMPRESS_AVAILABLE:
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(app)
+else:
+    logger.warning("flask-compress not installed, responses will be served uncompressed")
+
+# Persist compiled Jinja templates so they are parsed once per process,
+# not re-compiled on each render. The cache directory must exist up
+# front — jinja2 raises on dump into a missing one, and /tmp is cleared
+# on reboot.
+_jinja_cache_dir = os.path.join(tempfile.gettempdir(), 'sudan_news_jinja_cache')
+os.makedirs(_jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(_jinja_cache_dir)
+if os.getenv('FLASK_ENV') == 'production':
+    app.jinja_env.auto_reload = False
+
+def _warm_template_cache():
+    """Precompile all templates at startup to populate the bytecode cache."""
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            logger.warning(f"Could not precompile template {name}: {e}")
+
 # Bias data is now stored in the database, not in a separate JSON file
 # The ClusterRepository now returns bias and other source details directly
 
+# Category labels indexed by a 2-bit flag: bit 0 = local, bit 1 = international
+_CATEGORY_LABELS = (None, 'محلي', 'دولي', 'محلي ودولي')
+
+# Static category list (cities change rarely, categories are fixed by the NLP prompt)
+_CATEGORIES = ('سياسة', 'أمن وعسكر', 'اقتصاد', 'رياضة', 'مجتمع وثقافة', 'مقالات رأي')
+
+# Cities change rarely; refresh from the DB at most once per 10 minutes
+_cities_cache = TTLCache(maxsize=1, ttl=600)
+
+@cached(_cities_cache)
+def _load_cities():
+    """Load the unique city list, cached across requests."""
+    with get_session() as session:
+        cluster_repo = ClusterRepository(session)
+        return cluster_repo.get_all_cities()
+
 # Jinja2 filters (same as original)
 @app.template_filter('timeago_arabic')
 def timeago_arabic_filter(date_string):
@@ -110,6 +210,25 @@ def bias_arabic_filter(bias_value):
     }
     return bias_mapping.get(bias_value, 'غير محدد')
 
+# Warm the cache only after every template filter above is registered;
+# templates that use them fail to compile otherwise
+_warm_template_cache()
+
+def _with_etag(response):
+    """Attach a content-hash ETag and short-circuit to 304 on a match.
+
+    Lets clients revalidate cheaply after Cache-Control expiry instead of
+    re-downloading the full body. BLAKE2b is faster than SHA1 for this.
+    """
+    etag = blake2b(response.get_data(), digest_size=16).hexdigest()
+    if request.headers.get('If-None-Match') == etag:
+        not_modified = app.response_class(status=304)
+        not_modified.headers['ETag'] = etag
+        not_modified.headers['Cache-Control'] = response.headers.get('Cache-Control', '')
+        return not_modified
+    response.headers['ETag'] = etag
+    return response
+
 # Web Routes (unchanged)
 
 @app.route('/')
@@ -125,11 +244,11 @@ def index():
     city = request.args.get('city', '')
 
     try:
+        # Get all cities for the filter dropdown (TTL-cached)
+        all_cities = _load_cities()
+
         with get_session() as session:
             cluster_repo = ClusterRepository(session)
-            
-            # Get all cities for the filter dropdown
-            all_cities = cluster_repo.get_all_cities()
 
             if q or has_entities or (category and category != 'all') or city:
                 clusters, total_clusters = cluster_repo.get_clusters_with_filters(
@@ -164,7 +283,8 @@ def index():
     # Calculate page numbers to display (current page +/- 2)
     start_page = max(1, page - 2)
     end_page = min(total_pages + 1, page + 3)
-    page_numbers = list(range(start_page, end_page))
+    # Jinja iterates range objects lazily, no need to materialize a list
+    page_numbers = range(start_page, end_page)
 
     # Helper to enrich clusters with article data
     def enrich_clusters(cluster_list):
@@ -181,25 +301,26 @@ def index():
                     if cluster_data.get('bias_distribution'):
                         setattr(cluster, 'bias_distribution', cluster_data['bias_distribution'])
                     
-                    # Use NLP categories for labeling if available
-                    nlp_categories = []
-                    for article in cluster_data['articles']:
-                        if article.get('nlp_category'):
-                            nlp_categories.append(article['nlp_category'])
-                    if nlp_categories:
-                        # Use the first NLP category as label
-                        setattr(cluster, 'category_label', nlp_categories[0])
+                    # Use the first available NLP category as label, stopping
+                    # at the first hit instead of collecting them all
+                    first_nlp_category = next(
+                        (a['nlp_category'] for a in cluster_data['articles'] if a.get('nlp_category')),
+                        None
+                    )
+                    if first_nlp_category:
+                        setattr(cluster, 'category_label', first_nlp_category)
                 else:
                     # Fallback to local/international
                     # Note: cluster_data might be None if cluster deleted but still in list? Unlikely but possible.
                     if cluster_data and cluster_data.get('articles'):
-                        categories = set(article['category'] for article in cluster_data['articles'])
-                        if 'local' in categories and 'international' in categories:
-                            setattr(cluster, 'category_label', 'محلي ودولي')
-                        elif 'international' in categories:
-                            setattr(cluster, 'category_label', 'دولي')
-                        else:
-                            setattr(cluster, 'category_label', 'محلي')
+                        # Single pass with bit flags instead of building a set
+                        flags = 0
+                        for article in cluster_data['articles']:
+                            category = article['category']
+                            flags |= (category == 'local') | ((category == 'international') << 1)
+                            if flags == 3:
+                                break
+                        setattr(cluster, 'category_label', _CATEGORY_LABELS[flags] or 'محلي')
 
     # Enrich both lists
     enrich_clusters(clusters)
@@ -340,7 +461,7 @@ def api_clusters():
     # Add caching headers
     response = jsonify(result)
     response.headers['Cache-Control'] = 'max-age=300'  # 5 minutes
-    return response
+    return _with_etag(response)
 
 @app.route('/api/cluster/<int:cluster_id>')
 def api_cluster(cluster_id):
@@ -353,34 +474,23 @@ def api_cluster(cluster_id):
         # Bias and other source details are now included in the article data from the repository
         response = jsonify(cluster)
         response.headers['Cache-Control'] = 'max-age=600'  # 10 minutes
-        return response
+        return _with_etag(response)
 
     return jsonify({'error': 'Cluster not found'}), 404
 
 @app.route('/api/categories')
 def api_categories():
     """API endpoint for unique categories from entities."""
-    with get_session() as session:
-        cluster_repo = ClusterRepository(session)
-        # Get categories from cluster filtering (this approximates the original logic)
-        _, _ = cluster_repo.get_clusters_with_filters(limit=1, offset=0)
-        # For now, return static categories (can be enhanced later)
-        categories = ['سياسة', 'أمن وعسكر', 'اقتصاد', 'رياضة', 'مجتمع وثقافة', 'مقالات رأي']
-
-    response = jsonify(categories)
+    response = jsonify(list(_CATEGORIES))
     response.headers['Cache-Control'] = 'max-age=3600'  # 1 hour
-    return response
+    return _with_etag(response)
 
 @app.route('/api/cities')
 def api_cities():
     """API endpoint for unique cities from entities."""
-    with get_session() as session:
-        cluster_repo = ClusterRepository(session)
-        cities = cluster_repo.get_all_cities()
-
-    response = jsonify(cities)
+    response = jsonify(_load_cities())
     response.headers['Cache-Control'] = 'max-age=3600'  # 1 hour
-    return response
+    return _with_etag(response)
 
 @app.route('/api/articles')
 def api_articles():
@@ -399,7 +509,7 @@ def api_articles():
 
     response = jsonify(articles)
     response.headers['Cache-Control'] = 'max-age=300'  # 5 minutes
-    return response
+    return _with_etag(response)
 
 @app.route('/api/register_token', methods=['POST'])
 def api_register_token():
@@ -443,8 +553,8 @@ def api_send_notification():
         return jsonify({'error': 'Title and body are required'}), 400
 
     try:
-        result = notification_service.send_to_all_users(title, body, data_payload)
-        return jsonify(result)
+        _dispatch_notification(get_notification_service().send_to_all_users, title, body, data_payload)
+        return jsonify({'status': 'queued'})
     except Exception as e:
         logger.error(f"Error sending notification: {e}")
         return jsonify({'error': str(e)}), 500
@@ -453,8 +563,8 @@ def api_send_notification():
 def api_notify_new_cluster(cluster_id):
     """API endpoint to send notification for a new cluster."""
     try:
-        result = notification_service.send_new_cluster_notification(cluster_id)
-        return jsonify(result)
+        _dispatch_notification(get_notification_service().send_new_cluster_notification, cluster_id)
+        return jsonify({'status': 'queued', 'cluster_id': cluster_id})
     except Exception as e:
         logger.error(f"Error sending new cluster notification: {e}")
         return jsonify({'error': str(e)}), 500
@@ -463,16 +573,18 @@ def api_notify_new_cluster(cluster_id):
 def api_notify_popular_clusters():
     """API endpoint to send notifications for popular clusters."""
     try:
-        popular_clusters = notification_service.get_popular_clusters_for_notification()
+        # The cluster lookup is cheap (cached); only the FCM fan-out is
+        # deferred to the background worker
+        popular_clusters = get_notification_service().get_popular_clusters_for_notification()
 
         results = []
         for cluster in popular_clusters:
-            result = notification_service.send_popular_cluster_notification(cluster['id'])
+            _dispatch_notification(get_notification_service().send_popular_cluster_notification, cluster['id'])
             results.append({
                 'cluster_id': cluster['id'],
                 'title': cluster['title'],
                 'sources': cluster['number_of_sources'],
-                'notification_result': result
+                'notification_result': {'status': 'queued'}
             })
 
         return jsonify({
@@ -491,13 +603,13 @@ def api_notification_stats():
             token_repo = TokenRepository(session)
             stats = token_repo.get_token_stats()
 
-        popular_clusters = notification_service.get_popular_clusters_for_notification()
+        popular_clusters = get_notification_service().get_popular_clusters_for_notification()
 
         return jsonify({
             'token_stats': stats,
             'popular_clusters_count': len(popular_clusters),
             'popular_clusters': popular_clusters,
-            'firebase_initialized': bool(notification_service._is_initialized())
+            'firebase_initialized': bool(get_notification_service()._is_initialized())
         })
     except Exception as e:
         logger.error(f"Error getting notification stats: {e}")
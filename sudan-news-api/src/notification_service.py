@@ -5,49 +5,140 @@ Handles push notifications for the Sudan News API.
 ONLY FCM is used. Expo notifications have been completely removed.
 """
 
+import asyncio
+import functools
 import os
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import platform
+import textwrap
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
 import firebase_admin
 from firebase_admin import credentials, messaging
 
+from cachetools import TTLCache, cached
+
 from shared_models.repositories.token_repository import TokenRepository
 from shared_models.repositories.cluster_repository import ClusterRepository
 from shared_models.db import get_session
 
 logger = logging.getLogger(__name__)
 
+# FCM allows at most 500 messages per send_each call
+FCM_BATCH_SIZE = 500
+
+# Worker threads dispatching send_each batches; bounded so a large audience
+# can't spawn a thread storm
+FCM_SEND_WORKERS = int(os.getenv('FCM_SEND_WORKERS', '4'))
+
+# Google OAuth access tokens live ~60 minutes; refreshing at 50 keeps a
+# warm token so no send ever pays the RS256 sign + token-exchange round-trip
+TOKEN_REFRESH_INTERVAL_SECONDS = 50 * 60
+
+# Android delivery settings never vary per message, so one shared config
+# serves every recipient
+_ANDROID_CONFIG = messaging.AndroidConfig(
+    priority="high",
+    notification=messaging.AndroidNotification(
+        channel_id="default",
+    )
+)
+
+# Popular-cluster lookups change slowly (pipeline runs every few hours),
+# so repeated notification checks within 5 minutes reuse the same result
+_popular_clusters_cache = TTLCache(maxsize=1, ttl=300)
+
+
+def _preview(text: Optional[str], width: int = 50) -> str:
+    """Shorten notification text at a word boundary with a single ellipsis.
+
+    Unlike a raw [:50] slice, this never cuts an Arabic word mid-grapheme.
+    """
+    return textwrap.shorten(text or "", width=width, placeholder="…")
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO-8601 string (optionally Z-suffixed), or None on bad input."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+
+
+@cached(_popular_clusters_cache)
+def _fetch_popular_clusters() -> List[Dict[str, Any]]:
+    """Query recent multi-source clusters with their article counts.
+
+    Two queries total: one SQL-filtered cluster scan (48-hour window,
+    2+ sources) and one GROUP BY for article counts, instead of a full
+    detail fetch per cluster.
+    """
+    cutoff = (datetime.now() - timedelta(hours=48)).isoformat()
+
+    with get_session() as session:
+        repo = ClusterRepository(session)
+        rows = repo.get_popular_clusters(threshold=2, limit=50, since=cutoff)
+        article_counts = repo.get_article_counts_by_cluster([row.id for row in rows])
+
+    popular_clusters = [{
+        'id': row.id,
+        'title': row.title,
+        'number_of_sources': row.number_of_sources,
+        'article_count': article_counts.get(row.id, 0),
+        'created_at': row.created_at
+    } for row in rows]
+
+    # Sort by coverage (most sources first) and limit to top 10
+    popular_clusters.sort(key=lambda x: x['number_of_sources'], reverse=True)
+    return popular_clusters[:10]
+
+
 class NotificationService:
     """Service for sending push notifications via Firebase Cloud Messaging"""
 
     def __init__(self):
-        self._initialized = False
+        self._app = None
+        # Resolved once; platform.system() never changes within a process
+        self._credentials_path = self._get_credentials_path()
         self._initialize_firebase()
 
     def _initialize_firebase(self):
-        """Initialize Firebase Admin SDK"""
+        """Initialize Firebase Admin SDK (idempotent, one app per process)"""
         try:
+            if self._app is not None:
+                # Already holding the app handle; nothing to rebuild
+                return
+
             if firebase_admin._apps:
-                self._initialized = True
+                # Keep a handle to the default app so send paths skip
+                # the global registry lookup
+                self._app = firebase_admin.get_app()
                 logger.info("Firebase already initialized")
                 return
 
-            credentials_path = self._get_credentials_path()
+            credentials_path = self._credentials_path
 
             if not credentials_path or not os.path.exists(credentials_path):
-                logger.warning(f"Firebase credentials not found at {credentials_path}")
+                logger.warning("Firebase credentials not found at %s", credentials_path)
                 return
 
             cred = credentials.Certificate(credentials_path)
-            firebase_admin.initialize_app(cred)
+            self._app = firebase_admin.initialize_app(cred)
 
-            self._initialized = True
             logger.info("Firebase initialized successfully")
 
+            # Warm the OAuth access token off the init path and keep it
+            # fresh so sends never block on a token exchange
+            threading.Thread(target=self._refresh_access_token, daemon=True).start()
+
         except Exception as e:
-            logger.error(f"Failed to initialize Firebase: {e}")
-            self._initialized = False
+            logger.error("Failed to initialize Firebase: %s", e)
+            self._app = None
 
     def _get_credentials_path(self) -> Optional[str]:
         """Get Firebase credentials path based on platform"""
@@ -55,14 +146,24 @@ class NotificationService:
         if path:
             return path
 
-        import platform
         if platform.system() == 'Windows':
             return r'C:\Users\DELL\Desktop\GN\Sudan-new-Backend\firebase_key.json'
         else:
             return '/var/www/sudanese_news/shared/firebase_key.json'
 
     def _is_initialized(self) -> bool:
-        return self._initialized and firebase_admin._apps
+        return self._app is not None
+
+    def _refresh_access_token(self):
+        """Refresh the cached OAuth token and reschedule before it expires."""
+        try:
+            self._app.credential.get_access_token()
+        except Exception as e:
+            logger.warning("Proactive FCM token refresh failed: %s", e)
+        finally:
+            timer = threading.Timer(TOKEN_REFRESH_INTERVAL_SECONDS, self._refresh_access_token)
+            timer.daemon = True
+            timer.start()
 
     # ------------------------------------------------------------------
     # PUBLIC - Send to all tokens
@@ -74,32 +175,82 @@ class NotificationService:
             return {'success': 0, 'failure': 0, 'error': 'Firebase not initialized'}
 
         try:
+            success = 0
+            failure = 0
+            seen_any = False
+
+            # Stream tokens in DB batches and dispatch each FCM-sized batch
+            # on a bounded worker pool, so DB I/O and several send_each
+            # round-trips overlap while peak memory stays bounded by the
+            # number of in-flight batches
             with get_session() as session:
                 token_repo = TokenRepository(session)
-                tokens = token_repo.get_all_active_tokens()
-
-            if not tokens:
+                token_iter = token_repo.iter_active_tokens()
+
+                # The notification payload and data dict are identical for
+                # every recipient; build them once and only allocate a
+                # Message per token
+                notification = messaging.Notification(title=title, body=body)
+                payload = data or {}
+
+                with ThreadPoolExecutor(max_workers=FCM_SEND_WORKERS) as executor:
+                    pending = set()
+                    # SQL already deduplicates (token, platform) pairs; this
+                    # guards against the same token registered under several
+                    # platforms, which would double-notify the device
+                    seen_tokens = set()
+
+                    while True:
+                        tokens = list(islice(token_iter, FCM_BATCH_SIZE))
+                        if not tokens:
+                            break
+                        seen_any = True
+
+                        batch = [
+                            messaging.Message(
+                                token=t["token"],
+                                notification=notification,
+                                data=payload,
+                                android=_ANDROID_CONFIG
+                            ) for t in tokens
+                            if not (t["token"] in seen_tokens or seen_tokens.add(t["token"]))
+                        ]
+                        if not batch:
+                            continue
+                        pending.add(executor.submit(self._send_fcm_batch, batch))
+
+                        # Drain completed sends before queueing more batches
+                        if len(pending) >= FCM_SEND_WORKERS * 2:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                batch_success, batch_failure = future.result()
+                                success += batch_success
+                                failure += batch_failure
+
+                    for future in as_completed(pending):
+                        batch_success, batch_failure = future.result()
+                        success += batch_success
+                        failure += batch_failure
+
+            if not seen_any:
                 logger.info("No active tokens found")
                 return {'success': 0, 'failure': 0, 'message': 'No active tokens'}
 
-            success = 0
-            failure = 0
-
-            for t in tokens:
-                token = t["token"]
-                try:
-                    self._send_single_fcm_notification(token, title, body, data)
-                    success += 1
-                except Exception as e:
-                    logger.error(f"Failed to send to {token[:20]}...: {e}")
-                    failure += 1
-
             return {'success': success, 'failure': failure}
 
         except Exception as e:
-            logger.error(f"Error sending notifications: {e}")
+            logger.error("Error sending notifications: %s", e)
             return {'success': 0, 'failure': 0, 'error': str(e)}
 
+    async def send_to_all_users_async(self, title: str, body: str,
+                                      data: Dict[str, str] = None) -> Dict[str, Any]:
+        """Async facade over send_to_all_users for event-loop callers.
+
+        Runs the sync firebase-admin fan-out in a worker thread so an
+        asyncio server can await it without blocking the event loop.
+        """
+        return await asyncio.to_thread(self.send_to_all_users, title, body, data)
+
     # ------------------------------------------------------------------
     # Send new cluster notification
     # ------------------------------------------------------------------
@@ -107,64 +258,31 @@ class NotificationService:
         try:
             with get_session() as session:
                 repo = ClusterRepository(session)
-                cluster = repo.get_cluster_details(cluster_id)
+                cluster = repo.get_cluster_summary(cluster_id)
 
             if not cluster:
                 return {'error': f'Cluster {cluster_id} not found'}
 
             title = "خبر جديد"
-            body = f"تم نشر مجموعة أخبار جديدة: {cluster['title'][:50]}..."
+            body = f"تم نشر مجموعة أخبار جديدة: {_preview(cluster['title'])}"
 
             data = {"clusterId": str(cluster_id), "type": "new_cluster"}
 
             return self.send_to_all_users(title, body, data)
 
         except Exception as e:
-            logger.error(f"Error sending new cluster notification: {e}")
+            logger.error("Error sending new cluster notification: %s", e)
             return {'error': str(e)}
 
     # ------------------------------------------------------------------
     # Get popular clusters for notification
     # ------------------------------------------------------------------
     def get_popular_clusters_for_notification(self) -> List[Dict[str, Any]]:
-        """Get clusters that have 2 or more articles (considered 'popular/developing' news)"""
+        """Get recent clusters covered by 2+ sources (considered 'popular/developing' news)"""
         try:
-            with get_session() as session:
-                repo = ClusterRepository(session)
-                # Get recent clusters from last 48 hours
-                from datetime import datetime, timedelta
-                cutoff = datetime.now() - timedelta(hours=48)
-
-                # Get recent clusters and filter those with 2+ articles
-                recent_clusters = repo.get_recent_clusters(limit=100)  # Get more to filter
-                popular_clusters = []
-
-                for cluster in recent_clusters:
-                    # Check if cluster was created within last 48 hours
-                    try:
-                        cluster_date = datetime.fromisoformat(cluster.created_at.replace('Z', '+00:00'))
-                        if cluster_date < cutoff:
-                            continue
-                    except:
-                        continue
-
-                    # Get cluster details to check article count
-                    cluster_details = repo.get_cluster_details(cluster.id)
-                    if cluster_details and len(cluster_details.get('articles', [])) >= 2:
-                        popular_clusters.append({
-                            'id': cluster.id,
-                            'title': cluster.title,
-                            'number_of_sources': cluster.number_of_sources,
-                            'article_count': len(cluster_details['articles']),
-                            'created_at': cluster.created_at
-                        })
-
-                # Sort by article count (most articles first) and limit to top 10
-                popular_clusters.sort(key=lambda x: x['article_count'], reverse=True)
-                return popular_clusters[:10]
-
+            return _fetch_popular_clusters()
         except Exception as e:
-            logger.error(f"Error getting popular clusters for notification: {e}")
+            logger.error("Error getting popular clusters for notification: %s", e)
             return []
 
     # ------------------------------------------------------------------
@@ -174,40 +292,28 @@ class NotificationService:
         try:
             with get_session() as session:
                 repo = ClusterRepository(session)
-                cluster = repo.get_cluster_details(cluster_id)
+                cluster = repo.get_cluster_summary(cluster_id)
 
             if not cluster:
                 return {'error': f'Cluster {cluster_id} not found'}
 
-            articles = cluster.get('articles', [])
-            if not articles:
+            article_count = cluster['article_count']
+            if not article_count:
                 return {'error': f'No articles found for cluster {cluster_id}'}
 
-            article_count = len(articles)
-
-            # Find the earliest article by published_at date
-            earliest_article = None
-            earliest_date = None
-
-            for article in articles:
-                if article.get('published_at'):
-                    try:
-                        article_date = datetime.fromisoformat(article['published_at'].replace('Z', '+00:00'))
-                        if earliest_date is None or article_date < earliest_date:
-                            earliest_date = article_date
-                            earliest_article = article
-                    except (ValueError, TypeError):
-                        continue
+            # The summary already carries the earliest article's headline
+            # and date, so no article list is fetched here
+            earliest_date = _parse_iso(cluster['earliest_published_at'])
 
             # Use earliest article's headline as title, fallback to cluster title
-            if earliest_article:
-                title = earliest_article.get('headline', cluster['title'])[:50]
+            if cluster['earliest_headline']:
+                title = _preview(cluster['earliest_headline'])
                 # Format the date for display
                 date_str = earliest_date.strftime('%Y-%m-%d %H:%M') if earliest_date else ''
                 body = f"خبر متطور: {article_count} مصادر - {date_str}"
             else:
                 # Fallback to original logic if no dates available
-                title = cluster['title'][:50]
+                title = _preview(cluster['title'])
                 body = f"مجموعة أخبار تحتوي على {article_count} مقالة"
 
             data = {
@@ -219,7 +325,7 @@ class NotificationService:
             return self.send_to_all_users(title, body, data)
 
         except Exception as e:
-            logger.error(f"Error sending popular cluster notification: {e}")
+            logger.error("Error sending popular cluster notification: %s", e)
             return {'error': str(e)}
 
     # ------------------------------------------------------------------
@@ -228,33 +334,46 @@ class NotificationService:
     def _send_single_fcm_notification(self, token: str, title: str, body: str, data: Dict[str, str] = None):
         """
         Sends a SINGLE FCM notification.
-        This is the only notification method that remains.
+        Kept for one-off sends; the fan-out path uses send_each batches.
         """
+        message = self._build_fcm_message(token, title, body, data)
 
-        # Ensure we always send a proper FCM notification payload:
-        message = messaging.Message(
+        # Pass the cached app handle explicitly to skip the default-app lookup
+        response = messaging.send(message, app=self._app)
+        logger.debug("FCM sent: %s", response)
+
+    def _send_fcm_batch(self, batch: List[messaging.Message]) -> Tuple[int, int]:
+        """Send one FCM-sized batch, returning (success, failure) counts."""
+        batch_response = messaging.send_each(batch, app=self._app)
+
+        for message, response in zip(batch, batch_response.responses):
+            if not response.success:
+                logger.error("Failed to send to %s...: %s", message.token[:20], response.exception)
+
+        return batch_response.success_count, batch_response.failure_count
+
+    def _build_fcm_message(self, token: str, title: str, body: str,
+                           data: Dict[str, str] = None) -> messaging.Message:
+        """Build a proper FCM notification payload for one token."""
+        return messaging.Message(
             token=token,
             notification=messaging.Notification(
                 title=title,
                 body=body
             ),
             data=data or {},
-            android=messaging.AndroidConfig(
-                priority="high",
-                notification=messaging.AndroidNotification(
-                    channel_id="default",
-                )
-            )
+            android=_ANDROID_CONFIG
         )
 
-        response = messaging.send(message)
-        logger.debug(f"FCM sent: {response}")
-
     # ------------------------------------------------------------------
     def cleanup_invalid_tokens(self) -> int:
         logger.info("Token cleanup not implemented yet")
         return 0
 
 
-# Global instance
-notification_service = NotificationService()
+# Lazy per-process singleton: constructing the service at import time
+# would make every gunicorn worker pay credential/TLS setup on import,
+# and pre-fork workers must not inherit the parent's SSL state
+@functools.lru_cache(maxsize=1)
+def get_notification_service() -> NotificationService:
+    return NotificationService()
